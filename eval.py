@@ -1,9 +1,38 @@
 import chess
-import multiprocessing
+import chess.polyglot
+import sys
+import threading
+import time
+from array import array
+from operator import itemgetter
 from os import cpu_count
 
 # Constants
 INFINITY = 100000
+MAX_PLY = 64
+MATE_THRESHOLD = INFINITY - MAX_PLY  # Scores at or above this are forced mates
+ASPIRATION_WINDOW = 50
+DELTA_MARGIN = 200
+NULL_MOVE_REDUCTION = 2
+TT_SIZE = 1 << 20  # Transposition table slots (16 bytes each), a power of two
+
+# Transposition table entry flags
+EXACT = 0
+LOWERBOUND = 1
+UPPERBOUND = 2
+
+# Fixed-size transposition table shared by all search threads, indexed by the
+# low bits of the Zobrist key. tt_data packs each entry into one 64-bit word:
+#   bits 0-15   best move (from | to << 6 | promotion << 12, 0 for none)
+#   bits 16-17  flag
+#   bits 18-25  depth
+#   bits 26-45  value + INFINITY
+# tt_keys holds key ^ data, so a slot whose two words were written by
+# different racing threads fails the key check instead of returning a torn
+# entry. Writes are racy on purpose: a lost or stale entry only costs a
+# re-search.
+tt_keys = array("Q", bytes(8 * TT_SIZE))
+tt_data = array("Q", bytes(8 * TT_SIZE))
 
 # Material weights
 material_weights = {
@@ -14,45 +43,261 @@ material_weights = {
     chess.QUEEN: 900,
 }
 
+# Most-valuable-victim / least-valuable-attacker capture scores, indexed by
+# [victim][attacker] piece type
+mvv_lva = [
+    [
+        10 * material_weights.get(victim, 0) - material_weights.get(attacker, 0)
+        for attacker in range(chess.KING + 1)
+    ]
+    for victim in range(chess.KING + 1)
+]
+
+
+def count_material(board: chess.Board) -> int:
+    """Material balance (White minus Black) counted from scratch."""
+    white = board.occupied_co[chess.WHITE]
+    black = board.occupied_co[chess.BLACK]
+    popcount = chess.popcount
+    return (
+        material_weights[chess.PAWN]
+        * (popcount(board.pawns & white) - popcount(board.pawns & black))
+        + material_weights[chess.KNIGHT]
+        * (popcount(board.knights & white) - popcount(board.knights & black))
+        + material_weights[chess.BISHOP]
+        * (popcount(board.bishops & white) - popcount(board.bishops & black))
+        + material_weights[chess.ROOK]
+        * (popcount(board.rooks & white) - popcount(board.rooks & black))
+        + material_weights[chess.QUEEN]
+        * (popcount(board.queens & white) - popcount(board.queens & black))
+    )
+
+
+def tt_probe(key):
+    """Return (key, depth, value, flag, best_move) stored for key, or None."""
+    index = key & (TT_SIZE - 1)
+    data = tt_data[index]
+    if tt_keys[index] ^ data != key:
+        return None
+    move_bits = data & 0xFFFF
+    best_move = None
+    if move_bits:
+        best_move = chess.Move(
+            move_bits & 63, (move_bits >> 6) & 63, (move_bits >> 12) or None
+        )
+    return (
+        key,
+        (data >> 18) & 0xFF,
+        ((data >> 26) & 0xFFFFF) - INFINITY,
+        (data >> 16) & 3,
+        best_move,
+    )
+
+
+def tt_store(key, depth, value, flag, best_move):
+    """Store an entry unless its slot holds a deeper search of the same key."""
+    index = key & (TT_SIZE - 1)
+    old_data = tt_data[index]
+    if tt_keys[index] ^ old_data != key or depth >= (old_data >> 18) & 0xFF:
+        move_bits = 0
+        if best_move is not None:
+            move_bits = (
+                best_move.from_square
+                | best_move.to_square << 6
+                | (best_move.promotion or 0) << 12
+            )
+        data = move_bits | flag << 16 | depth << 18 | (value + INFINITY) << 26
+        tt_data[index] = data
+        tt_keys[index] = key ^ data
+
+
+def score_to_tt(score, ply):
+    """Convert a mate score from distance-from-root to distance-from-node."""
+    if score >= MATE_THRESHOLD:
+        return score + ply
+    if score <= -MATE_THRESHOLD:
+        return score - ply
+    return score
 
-def evaluate_board(board: chess.Board) -> int:
+
+def score_from_tt(score, ply):
+    """Convert a stored mate score back to distance-from-root at ply."""
+    if score >= MATE_THRESHOLD:
+        return score - ply
+    if score <= -MATE_THRESHOLD:
+        return score + ply
+    return score
+
+
+def evaluate_board(board: "MaterialBoard") -> int:
     """Simplified evaluation function considering only material balance."""
-    material = 0
-    for piece in board.piece_map().values():
-        value = material_weights.get(piece.piece_type, 0)
-        if piece.color == chess.WHITE:
-            material += value
-        else:
-            material -= value
-    return material
+    return board.material
 
 
-def order_moves(board):
-    """Simplified move ordering based on captures and promotions."""
-    moves = list(board.legal_moves)
+class MaterialBoard(chess.Board):
+    """chess.Board that keeps its material balance up to date across push/pop.
+
+    Only push and pop are tracked, so the position should not be edited
+    through set_fen, set_piece_at and friends after construction.
+    """
+
+    def __init__(self, fen=chess.STARTING_FEN, *, chess960=False):
+        super().__init__(fen, chess960=chess960)
+        self.material = count_material(self)
+        self._material_deltas = []
+
+    @classmethod
+    def from_board(cls, board):
+        """Copy the position of board (without its move stack), skipping FEN."""
+        material_board = cls(None, chess960=board.chess960)
+        material_board.pawns = board.pawns
+        material_board.knights = board.knights
+        material_board.bishops = board.bishops
+        material_board.rooks = board.rooks
+        material_board.queens = board.queens
+        material_board.kings = board.kings
+        material_board.occupied_co[chess.WHITE] = board.occupied_co[chess.WHITE]
+        material_board.occupied_co[chess.BLACK] = board.occupied_co[chess.BLACK]
+        material_board.occupied = board.occupied
+        material_board.promoted = board.promoted
+        material_board.ep_square = board.ep_square
+        material_board.castling_rights = board.castling_rights
+        material_board.turn = board.turn
+        material_board.fullmove_number = board.fullmove_number
+        material_board.halfmove_clock = board.halfmove_clock
+        material_board.material = count_material(material_board)
+        return material_board
+
+    def push(self, move):
+        delta = 0
+        if move:
+            if self.occupied_co[not self.turn] & chess.BB_SQUARES[move.to_square]:
+                delta += material_weights[self.piece_type_at(move.to_square)]
+            elif (
+                move.to_square == self.ep_square
+                and self.pawns & chess.BB_SQUARES[move.from_square]
+            ):
+                delta += material_weights[chess.PAWN]
+            if move.promotion:
+                delta += (
+                    material_weights[move.promotion] - material_weights[chess.PAWN]
+                )
+            if self.turn == chess.BLACK:
+                delta = -delta
+        super().push(move)
+        self.material += delta
+        self._material_deltas.append(delta)
+
+    def pop(self):
+        move = super().pop()
+        self.material -= self._material_deltas.pop()
+        return move
 
-    def move_score(move):
-        if move.promotion:
-            return material_weights[chess.QUEEN]
-        elif board.is_capture(move):
-            return 1  # Assign a basic score to captures
+    def copy(self, *, stack=True):
+        board = super().copy(stack=stack)
+        board.material = self.material
+        if stack:
+            stack = len(self._material_deltas) if stack is True else stack
+            board._material_deltas = self._material_deltas[-stack:]
+        return board
+
+
+def order_moves(board, ply, killers, history, hash_move=None):
+    """Order moves: hash move, promotions, captures (MVV-LVA), killers, history."""
+    # Captures are found with bitboard tests instead of board.is_capture(); a
+    # pawn moving to the en passant square is always an en passant capture.
+    enemy = board.occupied_co[not board.turn]
+    ep_square = board.ep_square
+    pawns = board.pawns
+    piece_type_at = board.piece_type_at
+    killer_1, killer_2 = killers[ply]
+    scored = []
+    for move in board.generate_legal_moves():
+        if move == hash_move:
+            score = INFINITY
+        elif move.promotion:
+            score = 90000
+        elif enemy & chess.BB_SQUARES[move.to_square]:
+            score = (
+                10000
+                + mvv_lva[piece_type_at(move.to_square)][
+                    piece_type_at(move.from_square)
+                ]
+            )
+        elif move.to_square == ep_square and pawns & chess.BB_SQUARES[move.from_square]:
+            score = 10000 + mvv_lva[chess.PAWN][chess.PAWN]
+        elif move == killer_1:
+            score = 9000
+        elif move == killer_2:
+            score = 8000
         else:
-            return 0
+            score = history[move.from_square][move.to_square]
+        scored.append((score, move))
 
-    moves.sort(key=move_score, reverse=True)
-    return moves
+    scored.sort(key=itemgetter(0), reverse=True)
+    return [move for _, move in scored]
 
 
-def negamax(board, depth, alpha, beta, color):
-    """Simplified Negamax search without advanced pruning techniques."""
-    if depth == 0 or board.is_game_over():
-        return color * evaluate_board(board)
+def has_non_pawn_material(board):
+    """Whether the side to move has any pieces besides pawns and its king."""
+    return bool(board.occupied_co[board.turn] & ~(board.pawns | board.kings))
 
-    max_eval = -INFINITY
-    for move in order_moves(board):
+
+def captures_first(board, hash_move=None):
+    """Yield the hash move, legal captures, then the other legal moves.
+
+    Moves are generated lazily, so when an early move cuts off the quiet
+    moves are never generated at all. Used at depth 1 instead of order_moves.
+    """
+    if hash_move is not None and board.is_legal(hash_move):
+        yield hash_move
+    for move in board.generate_legal_captures():
+        if move != hash_move:
+            yield move
+    ep_square = board.ep_square
+    pawns = board.pawns
+    not_enemy = chess.BB_ALL & ~board.occupied_co[not board.turn]
+    for move in board.generate_legal_moves(chess.BB_ALL, not_enemy):
+        if move == hash_move:
+            continue
+        if move.to_square == ep_square and pawns & chess.BB_SQUARES[move.from_square]:
+            continue  # En passant, already yielded as a capture
+        yield move
+
+
+def quiescence(board, alpha, beta, color, stop_event):
+    """Search captures only until the position is quiet, then evaluate.
+
+    The static evaluation is a stand-pat lower bound, and captures that could
+    not raise alpha even with DELTA_MARGIN to spare are skipped.
+    """
+    if stop_event.is_set():
+        return 0
+    stand_pat = color * evaluate_board(board)
+    if stand_pat >= beta:
+        return stand_pat
+    if stand_pat > alpha:
+        alpha = stand_pat
+
+    piece_type_at = board.piece_type_at
+    captures = []
+    for move in board.generate_legal_captures():
+        victim = piece_type_at(move.to_square) or chess.PAWN  # en passant
+        if (
+            not move.promotion
+            and stand_pat + material_weights[victim] + DELTA_MARGIN < alpha
+        ):
+            continue  # Delta pruning
+        captures.append((mvv_lva[victim][piece_type_at(move.from_square)], move))
+    captures.sort(key=itemgetter(0), reverse=True)
+
+    max_eval = stand_pat
+    for _, move in captures:
         board.push(move)
-        eval = -negamax(board, depth - 1, -beta, -alpha, -color)
+        eval = -quiescence(board, -beta, -alpha, -color, stop_event)
         board.pop()
+        if stop_event.is_set():
+            return 0
 
         if eval > max_eval:
             max_eval = eval
@@ -64,30 +309,285 @@ def negamax(board, depth, alpha, beta, color):
     return max_eval
 
 
-def evaluate_move(args):
-    move, board_fen, depth = args
-    board = chess.Board(board_fen)
-    board.push(move)
-    eval = -negamax(board, depth - 1, -INFINITY, INFINITY, -1)
-    return move, eval
+def negamax(board, depth, alpha, beta, color, ply, killers, history, stop_event):
+    """Negamax search with alpha-beta pruning and a transposition table.
+
+    killers[ply] holds the two most recent quiet moves that caused a beta
+    cutoff at this ply; history[from][to] accumulates depth * depth for every
+    quiet cutoff move. Both are private to the calling search thread.
 
+    Mate scores are INFINITY - ply from the winner's point of view. Returns 0
+    without touching the table once stop_event is set.
+    """
+    if stop_event.is_set():
+        return 0
+    if depth == 0:
+        return quiescence(board, alpha, beta, color, stop_event)
+    # board.is_game_over() would generate the legal moves a second time;
+    # checkmate and stalemate are detected from the move loop below instead.
+    # Fivefold repetition cannot occur within the search horizon.
+    if board.is_insufficient_material() or board.is_seventyfive_moves():
+        return 0
 
-def choose_best_move(board, max_depth):
-    """Select the best move using multiprocessing to evaluate moves in parallel."""
-    board_fen = board.fen()
-    moves = order_moves(board)
-    args = [(move, board_fen, max_depth) for move in moves]
+    alpha_orig = alpha
+    key = chess.polyglot.zobrist_hash(board)
+    hash_move = None
+    entry = tt_probe(key)
+    if entry is not None:
+        _, entry_depth, entry_value, entry_flag, hash_move = entry
+        entry_value = score_from_tt(entry_value, ply)
+        if entry_depth >= depth:
+            if entry_flag == EXACT:
+                return entry_value
+            elif entry_flag == LOWERBOUND and entry_value >= beta:
+                return entry_value
+            elif entry_flag == UPPERBOUND and entry_value <= alpha:
+                return entry_value
+
+    # Null-move pruning: if passing the turn still fails high at reduced depth,
+    # some real move would too. Skipped in check, right after another null
+    # move, and without pieces, where zugzwang makes passing unsound.
+    if (
+        ply > 0
+        and depth >= 3
+        and beta < MATE_THRESHOLD
+        and board.move_stack[-1]
+        and not board.is_check()
+        and has_non_pawn_material(board)
+    ):
+        board.push(chess.Move.null())
+        eval = -negamax(
+            board,
+            depth - 1 - NULL_MOVE_REDUCTION,
+            -beta,
+            -beta + 1,
+            -color,
+            ply + 1,
+            killers,
+            history,
+            stop_event,
+        )
+        board.pop()
+        if stop_event.is_set():
+            return 0
+        if eval >= beta:
+            return beta
 
-    # Use all available CPU cores
-    with multiprocessing.Pool(processes=cpu_count()) as pool:
-        results = pool.map(evaluate_move, args)
+    if depth == 1:
+        moves = captures_first(board, hash_move)
+    else:
+        moves = order_moves(board, ply, killers, history, hash_move)
 
-    # Find the best move from the results
+    max_eval = -INFINITY
     best_move = None
+    push = board.push
+    pop = board.pop
+    for move in moves:
+        push(move)
+        eval = -negamax(
+            board,
+            depth - 1,
+            -beta,
+            -alpha,
+            -color,
+            ply + 1,
+            killers,
+            history,
+            stop_event,
+        )
+        pop()
+        if stop_event.is_set():
+            return 0
+
+        if eval > max_eval:
+            max_eval = eval
+            best_move = move
+        if max_eval > alpha:
+            alpha = max_eval
+        if alpha >= beta:
+            if not move.promotion and not board.is_capture(move):
+                if move != killers[ply][0]:
+                    killers[ply][1] = killers[ply][0]
+                    killers[ply][0] = move
+                history[move.from_square][move.to_square] += depth * depth
+            break  # Alpha-beta cutoff
+
+    if best_move is None:
+        # No legal moves: every searched move scores above -INFINITY
+        return -(INFINITY - ply) if board.is_check() else 0
+
+    if max_eval <= alpha_orig:
+        flag = UPPERBOUND
+    elif max_eval >= beta:
+        flag = LOWERBOUND
+    else:
+        flag = EXACT
+    tt_store(key, depth, score_to_tt(max_eval, ply), flag, best_move)
+
+    return max_eval
+
+
+def root_negamax(board, depth, alpha, beta, color, killers, history, stop_event):
+    """Search every root move like negamax and return (score, best_move).
+
+    The root never takes a transposition table cutoff, so the move always
+    comes from this search. Returns (0, None) once stop_event is set.
+    """
+    key = chess.polyglot.zobrist_hash(board)
+    entry = tt_probe(key)
+    hash_move = entry[4] if entry is not None else None
+
+    alpha_orig = alpha
     max_eval = -INFINITY
-    for move, eval in results:
+    best_move = None
+    for move in order_moves(board, 0, killers, history, hash_move):
+        board.push(move)
+        eval = -negamax(
+            board, depth - 1, -beta, -alpha, -color, 1, killers, history, stop_event
+        )
+        board.pop()
+        if stop_event.is_set():
+            return 0, None
+
         if eval > max_eval:
             max_eval = eval
             best_move = move
+        if max_eval > alpha:
+            alpha = max_eval
+        if alpha >= beta:
+            break  # Alpha-beta cutoff
+
+    if max_eval <= alpha_orig:
+        flag = UPPERBOUND
+    elif max_eval >= beta:
+        flag = LOWERBOUND
+    else:
+        flag = EXACT
+    tt_store(key, depth, max_eval, flag, best_move)
+
+    return max_eval, best_move
+
 
+def search_root(
+    board, max_depth, color, stop_event, soft_deadline=None, is_main=False
+):
+    """Iteratively deepen the root position on a private board copy.
+
+    Each iteration searches a window of ASPIRATION_WINDOW around the previous
+    score and re-searches with an open bound on fail-low or fail-high. The
+    root entry stored in the transposition table by one iteration provides
+    the first move tried by the next. A forced mate ends the deepening; when
+    the main search (is_main) finds one it also stops every thread sharing
+    stop_event. Helpers never set stop_event, as cutting the main search
+    short would lose the mating move they found. No new iteration is started after
+    soft_deadline (a time.perf_counter() value).
+
+    Returns the best move of the last iteration that ended inside its
+    window, or the fail-high move of a re-search that was cut short. A
+    fail-low search only bounds every move from above, so its move is never
+    used. Depth 1 ignores stop_event, so a move is found even when the
+    search is stopped straight away.
+    """
+    killers = [[None, None] for _ in range(MAX_PLY)]
+    history = [[0] * 64 for _ in range(64)]
+    alpha, beta = -INFINITY, INFINITY
+    best_move = None
+    for depth in range(1, max_depth + 1):
+        # Until there is a move to play, search with an event nobody sets
+        iteration_stop = stop_event if best_move is not None else threading.Event()
+        while True:
+            score, move = root_negamax(
+                board, depth, alpha, beta, color, killers, history, iteration_stop
+            )
+            if iteration_stop.is_set():
+                return best_move
+            if score <= alpha and alpha > -INFINITY:
+                alpha = -INFINITY
+            elif score >= beta and beta < INFINITY:
+                best_move = move  # Refutes the window, so beats the old move
+                beta = INFINITY
+            else:
+                best_move = move
+                break
+        if score >= MATE_THRESHOLD:
+            # No deeper search can improve on a forced mate
+            if is_main:
+                stop_event.set()
+            break
+        if soft_deadline is not None and time.perf_counter() >= soft_deadline:
+            break
+        alpha, beta = score - ASPIRATION_WINDOW, score + ASPIRATION_WINDOW
     return best_move
+
+
+def helper_threads_enabled():
+    """Whether Lazy SMP helper threads can speed up the search.
+
+    Under the GIL, helpers only compete with the main search for the
+    interpreter, and the move played comes from the main search alone. With
+    the GIL held they make a fixed-depth search slower (about 2x with two
+    threads, 4x with eight), so they only run on free-threaded builds.
+    """
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+    return is_gil_enabled is not None and not is_gil_enabled()
+
+
+def choose_best_move(board, max_depth, executor, time_budget_ms=None):
+    """Select the best move using Lazy SMP.
+
+    On free-threaded Python (see helper_threads_enabled), up to
+    cpu_count() - 1 helper threads submitted to executor iteratively deepen
+    the root position alongside the calling thread and share cutoffs through
+    the transposition table. Helpers alternate between max_depth and
+    max_depth + 1 so they explore different subtrees, and are stopped once
+    the main search completes. No more threads are used than there are root
+    moves. With the GIL enabled the calling thread searches alone. A forced
+    move is returned without searching.
+
+    With a time_budget_ms, no new iteration starts after half the budget and
+    a running one is aborted when the budget runs out, except for depth 1,
+    which always completes. The move of the last completed iteration is
+    returned.
+    """
+    board = MaterialBoard.from_board(board)
+    color = 1 if board.turn == chess.WHITE else -1
+    moves = list(board.legal_moves)
+    if len(moves) <= 1:
+        # A forced move (or none at all) needs no search
+        return moves[0] if moves else None
+
+    stop_event = threading.Event()
+    soft_deadline = None
+    timer = None
+    if time_budget_ms is not None:
+        soft_deadline = time.perf_counter() + time_budget_ms / 2000
+        timer = threading.Timer(time_budget_ms / 1000, stop_event.set)
+        timer.start()
+
+    num_threads = min(len(moves), cpu_count()) if helper_threads_enabled() else 1
+    helpers = []
+    try:
+        for i in range(1, num_threads):
+            helpers.append(
+                executor.submit(
+                    search_root, board.copy(), max_depth + i % 2, color, stop_event
+                )
+            )
+
+        # Helpers only feed the transposition table; the move played is the
+        # main search's own result
+        best_move = search_root(
+            board.copy(), max_depth, color, stop_event, soft_deadline, is_main=True
+        )
+    finally:
+        # Even if the main search raises, stop the helpers and the timer
+        stop_event.set()
+        if timer is not None:
+            timer.cancel()
+    for helper in helpers:
+        # Helpers still queued behind another game's search are dropped rather
+        # than waited for; only running ones need to notice stop_event
+        if not helper.cancel():
+            helper.result()
+
+    return best_move if best_move is not None else moves[0]
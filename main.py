@@ -1,36 +1,61 @@
+import atexit
 import chess
 import sys
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import os
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from eval import choose_best_move
 from dotenv import load_dotenv
 
 load_dotenv()
 
+SEARCH_DEPTH = 7
+MOVE_OVERHEAD_MS = 100  # Reserved for network latency on every move
+MOVES_TO_GO = 30  # Assumed number of moves left when budgeting the clock
+
 
 class ChessEngine:
     def __init__(self):
-        self.board = chess.Board()
+        # Search helper threads are reused for every move of every game. They
+        # only run on free-threaded Python; the executor starts no threads
+        # until work is submitted.
+        self.executor = ThreadPoolExecutor(max_workers=os.cpu_count())
+
+    def make_move(self, board, time_left_ms=None, increment_ms=0):
+        time_budget_ms = None
+        if time_left_ms is not None:
+            available_ms = max(time_left_ms - MOVE_OVERHEAD_MS, 0)
+            time_budget_ms = min(
+                available_ms / MOVES_TO_GO + increment_ms, available_ms
+            )
+        return choose_best_move(board, SEARCH_DEPTH, self.executor, time_budget_ms)
 
-    def make_move(self, fen):
-        self.board.set_fen(fen)
-        return choose_best_move(self.board, 7)
+    def close(self):
+        self.executor.shutdown()
 
 
 class LichessBot:
     def __init__(self, api_token):
         self.api_token = api_token
         self.base_url = "https://lichess.org/api"
+        # One keep-alive session so every call reuses the TLS connection
+        self.session = requests.Session()
+        self.session.headers.update(self._get_headers())
+        self.session.mount(
+            "https://lichess.org", HTTPAdapter(pool_connections=4, pool_maxsize=8)
+        )
         self.engine = ChessEngine()
+        atexit.register(self.engine.close)
         self.username = None  # Will be set in get_account_info()
+        self.active_games = set()  # IDs of games with a running game thread
 
     def get_account_info(self):
         try:
-            response = requests.get(
-                f"{self.base_url}/account", headers=self._get_headers()
-            )
+            response = self.session.get(f"{self.base_url}/account")
             response.raise_for_status()
             account_info = response.json()
             self.username = account_info["id"]
@@ -47,9 +72,8 @@ class LichessBot:
 
     def accept_challenge(self, challenge_id):
         try:
-            response = requests.post(
-                f"{self.base_url}/challenge/{challenge_id}/accept",
-                headers=self._get_headers(),
+            response = self.session.post(
+                f"{self.base_url}/challenge/{challenge_id}/accept"
             )
             response.raise_for_status()
             print(f"Accepted challenge {challenge_id}")
@@ -60,9 +84,8 @@ class LichessBot:
         print("Starting to stream incoming events")
         while True:
             try:
-                response = requests.get(
+                response = self.session.get(
                     f"{self.base_url}/stream/event",
-                    headers=self._get_headers(),
                     stream=True,
                 )
                 response.raise_for_status()
@@ -86,18 +109,30 @@ class LichessBot:
 
     def handle_game_start(self, game):
         game_id = game["id"]
+        if game_id in self.active_games:
+            # Lichess re-sends gameStart for ongoing games after a reconnect
+            return
         print(f"Game started: {game_id}")
-        self.stream_game(game_id)
+        self.active_games.add(game_id)
+        # Play each game on its own thread so incoming events keep being read
+        # (and challenges accepted) while the engine is searching
+        threading.Thread(target=self._play_game, args=(game_id,), daemon=True).start()
+
+    def _play_game(self, game_id):
+        try:
+            self.stream_game(game_id)
+        finally:
+            self.active_games.discard(game_id)
 
     def stream_game(self, game_id):
         try:
-            response = requests.get(
+            response = self.session.get(
                 f"{self.base_url}/bot/game/stream/{game_id}",
-                headers=self._get_headers(),
                 stream=True,
             )
             response.raise_for_status()
             board = chess.Board()
+            applied_plies = 0  # Moves of the game already pushed onto board
             my_color = None
             for line in response.iter_lines():
                 if line:
@@ -115,11 +150,10 @@ class LichessBot:
                             return
 
                         # Initialize the board with the existing moves
-                        moves = game_state["state"].get("moves", "")
-                        if moves:
-                            moves = moves.split()
-                            for move in moves:
-                                board.push_uci(move)
+                        moves = game_state["state"].get("moves", "").split()
+                        for move in moves[applied_plies:]:
+                            board.push_uci(move)
+                        applied_plies = len(moves)
 
                         # Check if it's the bot's turn
                         if "isMyTurn" in game_state["state"]:
@@ -131,15 +165,21 @@ class LichessBot:
                             ) or (board.turn == chess.BLACK and my_color == "black")
 
                         if is_bot_turn:
-                            self.make_move(game_id, board)
+                            self.make_move(
+                                game_id,
+                                board,
+                                *self._get_clock(game_state["state"], my_color),
+                            )
                     elif game_state.get("type") == "gameState":
-                        # Apply new moves to the board
-                        moves = game_state.get("moves", "")
-                        if moves:
-                            moves = moves.split()
-                            board = chess.Board()  # Reset the board
-                            for move in moves:
-                                board.push_uci(move)
+                        # Apply only the moves played since the last update,
+                        # undoing any that were taken back
+                        moves = game_state.get("moves", "").split()
+                        while applied_plies > len(moves):
+                            board.pop()
+                            applied_plies -= 1
+                        for move in moves[applied_plies:]:
+                            board.push_uci(move)
+                        applied_plies = len(moves)
 
                         # Check if it's the bot's turn
                         if "isMyTurn" in game_state:
@@ -152,7 +192,11 @@ class LichessBot:
 
                         if game_state["status"] == "started":
                             if is_bot_turn:
-                                self.make_move(game_id, board)
+                                self.make_move(
+                                    game_id,
+                                    board,
+                                    *self._get_clock(game_state, my_color),
+                                )
                         else:
                             print(
                                 f"Game {game_id} ended with status: {game_state['status']}"
@@ -165,16 +209,15 @@ class LichessBot:
         except requests.exceptions.RequestException as e:
             print(f"Error streaming game {game_id}: {e}")
 
-    def make_move(self, game_id, board):
+    def make_move(self, game_id, board, time_left_ms=None, increment_ms=0):
         try:
             # Get a valid move from the engine
-            move = self.engine.make_move(board.fen())
+            move = self.engine.make_move(board, time_left_ms, increment_ms)
             print(f"Suggested move: {move}")
 
             if move:
-                move_response = requests.post(
-                    f"{self.base_url}/bot/game/{game_id}/move/{move}",
-                    headers=self._get_headers(),
+                move_response = self.session.post(
+                    f"{self.base_url}/bot/game/{game_id}/move/{move}"
                 )
                 move_response.raise_for_status()
                 print(f"Move {move} successfully made in game {game_id}")
@@ -186,6 +229,12 @@ class LichessBot:
                 f"Response content: {e.response.content if hasattr(e, 'response') else 'No response content'}"
             )
 
+    def _get_clock(self, state, my_color):
+        """Return the bot's remaining time and increment (ms) from a game state."""
+        if my_color == "white":
+            return state.get("wtime"), state.get("winc", 0)
+        return state.get("btime"), state.get("binc", 0)
+
     def _get_headers(self):
         return {
             "Authorization": f"Bearer {self.api_token}",